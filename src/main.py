@@ -1,18 +1,20 @@
-import json
+import inspect
+import orjson
 import pandas as pd
 import logging
-from collections import defaultdict
+from collections import Counter
 from utils.utils import (
     concat_dataframes,
-    lower_strip_df,
-    format_date,
-    delete_chars,
+    normalize_column,
     json_to_df,
     consolidate_pubmed_df,
     consolidate_clinical_trials_df,
     write_dict_to_json,
-    find_mentions_in_publications,
-    merge_dicts,
+    is_cache_fresh,
+    files_hash,
+    read_dfs_from_parquet,
+    write_dfs_to_parquet,
+    find_mentions_all,
 )
 
 logging.basicConfig(
@@ -21,12 +23,36 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
+logging.captureWarnings(True)
+
 logger = logging.getLogger(__name__)
 
 RESOURCE_FOLDER = "resources"
 
-
-def start_pipeline():
+# Arrow-backed columns with text ids. The pyarrow parser cannot keep rows with a
+# wrong number of fields: they are reported as warnings instead of failing the run.
+CSV_READ_OPTIONS = {
+    "engine": "pyarrow",
+    "dtype_backend": "pyarrow",
+    "dtype": {"id": "string[pyarrow]"},
+    "on_bad_lines": "warn",
+}
+PUBLICATION_COLUMNS = ["id", "title", "date", "journal"]
+
+SOURCE_FILES = [
+    f"{RESOURCE_FOLDER}/{filename}"
+    for filename in ["drugs.csv", "clinical_trials.csv", "pubmed.csv", "pubmed.json"]
+]
+CACHE_FOLDER = f"{RESOURCE_FOLDER}/.cache"
+CACHE_FILES = [
+    f"{CACHE_FOLDER}/{name}.parquet" for name in ["drugs", "pubmed", "clinical_trials"]
+]
+CACHE_VERSION_FILE = f"{CACHE_FOLDER}/version"
+# Any change to the loading or normalization code invalidates the cache.
+NORMALIZATION_CODE_FILES = [__file__, inspect.getsourcefile(normalize_column)]
+
+
+def start_pipeline(use_cache=False):
     """
     Starts the data processing pipeline.
 
@@ -34,20 +60,39 @@ def start_pipeline():
     generates a dictionary of drug mentions, and writes this dictionary
     to a JSON file.
 
+    Args:
+        use_cache (bool): If True, the normalized DataFrames are read from Parquet files
+            newer than the source files and built by the same code, or written there for
+            the next runs. Default is False.
+
     Returns:
         None
     """
     logger.info("Pipeline started...")
 
-    logger.info("Converting files to DataFrames...")
-    drugs_df, pubmed_df, clinical_trials_df = dfs_from_files()
-    logger.info("DataFrames created succesfuly.")
-
-    logger.info("Normalization of DataFrames...")
-    drugs_df, pubmed_df, clinical_trials_df = normalize_dfs(
-        drugs_df, pubmed_df, clinical_trials_df
-    )
-    logger.info("DataFrames normalized.")
+    cache_version = files_hash(NORMALIZATION_CODE_FILES)
+    if use_cache and is_cache_fresh(
+        CACHE_FILES, SOURCE_FILES, CACHE_VERSION_FILE, cache_version
+    ):
+        logger.info("Loading normalized DataFrames from cache...")
+        drugs_df, pubmed_df, clinical_trials_df = read_dfs_from_parquet(CACHE_FILES)
+        logger.info("DataFrames loaded from cache.")
+    else:
+        logger.info("Converting files to DataFrames...")
+        drugs_df, pubmed_df, clinical_trials_df = dfs_from_files()
+        logger.info("DataFrames created succesfuly.")
+
+        logger.info("Normalization of DataFrames...")
+        drugs_df, pubmed_df, clinical_trials_df = normalize_dfs(
+            drugs_df, pubmed_df, clinical_trials_df
+        )
+        logger.info("DataFrames normalized.")
+
+        if use_cache:
+            write_dfs_to_parquet([drugs_df, pubmed_df, clinical_trials_df], CACHE_FILES)
+            with open(CACHE_VERSION_FILE, "w") as f:
+                f.write(cache_version)
+            logger.info("Normalized DataFrames cached.")
 
     logger.info("Generating mentions dict...")
     mentions_dict = generate_mentions_dict(drugs_df, pubmed_df, clinical_trials_df)
@@ -70,10 +115,25 @@ def dfs_from_files():
             - pubmed_df: DataFrame containing PubMed data.
             - clinical_trials_df: DataFrame containing clinical trials data.
     """
-    drugs_df = pd.read_csv(f"{RESOURCE_FOLDER}/drugs.csv")
-    clinical_trials_df = pd.read_csv(f"{RESOURCE_FOLDER}/clinical_trials.csv")
-    pubmed_df1 = pd.read_csv(f"{RESOURCE_FOLDER}/pubmed.csv")
-    pubmed_df2 = json_to_df(f"{RESOURCE_FOLDER}/pubmed.json")
+    drugs_df = pd.read_csv(
+        f"{RESOURCE_FOLDER}/drugs.csv",
+        usecols=["atccode", "drug"],
+        **CSV_READ_OPTIONS,
+    )
+    clinical_trials_df = pd.read_csv(
+        f"{RESOURCE_FOLDER}/clinical_trials.csv",
+        usecols=["id", "scientific_title", "date", "journal"],
+        **CSV_READ_OPTIONS,
+    )
+    # The tab-only last line of pubmed.csv is reported as a bad line and skipped.
+    pubmed_df1 = pd.read_csv(
+        f"{RESOURCE_FOLDER}/pubmed.csv",
+        usecols=PUBLICATION_COLUMNS,
+        **CSV_READ_OPTIONS,
+    )
+    pubmed_df2 = json_to_df(f"{RESOURCE_FOLDER}/pubmed.json")[
+        PUBLICATION_COLUMNS
+    ].astype({"id": "string[pyarrow]"})
     pubmed_df = concat_dataframes([pubmed_df1, pubmed_df2])
     return drugs_df, pubmed_df, clinical_trials_df
 
@@ -82,8 +142,8 @@ def normalize_dfs(drugs_df, pubmed_df, clinical_trials_df):
     """
     Normalizes the DataFrames by applying transformations to the columns.
 
-    This includes lowercasing, formatting dates,
-    and removing unwanted characters.
+    Each column is normalized with one call: lowercasing, formatting
+    dates and removing unwanted characters.
 
     Args:
         drugs_df (pd.DataFrame): DataFrame containing drug data.
@@ -93,12 +153,13 @@ def normalize_dfs(drugs_df, pubmed_df, clinical_trials_df):
     Returns:
         tuple: A tuple containing the three normalized DataFrames.
     """
-    drugs_df = lower_strip_df(drugs_df)
-    pubmed_df = lower_strip_df(pubmed_df)
-    clinical_trials_df = lower_strip_df(clinical_trials_df)
-
-    pubmed_df = format_date(pubmed_df, "date")
-    clinical_trials_df = format_date(clinical_trials_df, "date")
+    drugs_df = drugs_df.apply(normalize_column)
+    pubmed_df = pubmed_df.apply(
+        lambda column: normalize_column(column, is_date=column.name == "date")
+    )
+    clinical_trials_df = clinical_trials_df.apply(
+        lambda column: normalize_column(column, is_date=column.name == "date")
+    )
 
     pubmed_df["article_type"] = "pubmed"
     clinical_trials_df["article_type"] = "clinical_trials"
@@ -108,9 +169,6 @@ def normalize_dfs(drugs_df, pubmed_df, clinical_trials_df):
     )
     pubmed_df = pubmed_df.rename(columns={"date": "date_mention"})
 
-    clinical_trials_df = delete_chars(clinical_trials_df)
-    pubmed_df = delete_chars(pubmed_df)
-
     pubmed_df = consolidate_pubmed_df(pubmed_df)
     clinical_trials_df = consolidate_clinical_trials_df(clinical_trials_df)
 
@@ -122,7 +180,7 @@ def generate_mentions_dict(drugs_df, pubmed_df, clinical_trials_df):
     Generates a dictionary of drug mentions from the DataFrames.
 
     This function searches for drug mentions in PubMed articles and
-    clinical trials.
+    clinical trials in a single pass over all publications.
 
     Args:
         drugs_df (pd.DataFrame): DataFrame containing drug data.
@@ -132,11 +190,8 @@ def generate_mentions_dict(drugs_df, pubmed_df, clinical_trials_df):
     Returns:
         dict: A dictionary containing drug mentions.
     """
-    pubmed_mentions = find_mentions_in_publications(drugs_df, pubmed_df, "pubmed")
-    clinical_trials_mentions = find_mentions_in_publications(
-        drugs_df, clinical_trials_df, "clinical_trials"
-    )
-    return merge_dicts(pubmed_mentions, clinical_trials_mentions)
+    publications_df = concat_dataframes([pubmed_df, clinical_trials_df])
+    return find_mentions_all(drugs_df, publications_df, ["pubmed", "clinical_trials"])
 
 
 def print_max_journal_distinct_drugs(filepath, output_filepath):
@@ -149,19 +204,21 @@ def print_max_journal_distinct_drugs(filepath, output_filepath):
     Returns:
         None
     """
-    with open(filepath, "r") as file:
-        data = json.load(file)
-
-    journal_counts = defaultdict(set)
-    for drug, info in data.items():
-        for entry in info["journal"]:
-            journal_counts[entry["journal"]].add(drug)
-    max_drug_quoted = len(max(journal_counts.items(), key=lambda x: len(x[1]))[1])
-    journal_with_max_drug_quoted = [
-        journal[0]
-        for journal in journal_counts.items()
-        if len(journal[1]) == max_drug_quoted
-    ]
+    with open(filepath, "rb") as file:
+        data = orjson.loads(file.read())
+
+    # Drug names are unique keys: counting each drug's distinct journals once
+    # gives the number of distinct drugs per journal.
+    journal_counts = Counter()
+    for info in data.values():
+        journal_counts.update({entry["journal"] for entry in info["journal"]})
+
+    max_drug_quoted, journal_with_max_drug_quoted = 0, []
+    for journal, count in journal_counts.items():
+        if count > max_drug_quoted:
+            max_drug_quoted, journal_with_max_drug_quoted = count, [journal]
+        elif count == max_drug_quoted:
+            journal_with_max_drug_quoted.append(journal)
     print(
         f"The journal that mentions the most different drug(s) is/are : {journal_with_max_drug_quoted} with {max_drug_quoted} drugs quoted."
     )
@@ -174,7 +231,7 @@ def print_max_journal_distinct_drugs(filepath, output_filepath):
 
 
 if __name__ == "__main__":
-    start_pipeline()
+    start_pipeline(use_cache=True)
     print_max_journal_distinct_drugs(
         "src/result/drug_mentions_graph.json", "src/result/journal_max_drug_quoted.txt"
     )
@@ -1,42 +1,78 @@
-import json5
-import json
+import ahocorasick
+import hashlib
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
 import unicodedata
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import chain
+
+UNWANTED_CHARS_PATTERN = "|".join(
+    re.escape(chars) for chars in ["\\xc3\\xb1", "\\xc3\\x28", "\u2122"]
+)
+TRAILING_COMMA_PATTERN = re.compile(rb",(\s*[\]}])")
+# Translation table deleting the combining marks (accents) left by NFD normalization.
+COMBINING_MARKS = dict.fromkeys(
+    c for c in range(sys.maxunicode + 1) if unicodedata.category(chr(c)) == "Mn"
+)
+# Publications scanned per process; below that, forking costs more than the scan.
+SCAN_CHUNK_SIZE = 100_000
+# Automaton of a scan worker process, set once by init_scan_worker.
+worker_automaton = None
+# Month first, as the "mixed" parser reads ambiguous dates.
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d %B %Y"]
+
+
+def serialize_timestamp(obj):
+    """
+    Serializes the objects orjson does not format as expected.
 
+    Datetime objects are converted to string format (YYYY-MM-DD).
 
-class TimestampEncoder(json.JSONEncoder):
-    """
-    Custom JSON encoder for handling datetime objects.
+    Args:
+        obj: The object to serialize.
 
-    This encoder converts datetime objects to string format (YYYY-MM-DD).
-    """
+    Returns:
+        str: The serialized object.
 
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.strftime("%Y-%m-%d")
-        return super().default(obj)
+    Raises:
+        TypeError: If the object type is not supported.
+    """
+    if isinstance(obj, datetime):
+        return obj.strftime("%Y-%m-%d")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
 def json_to_df(filepath):
     """
-    Loads data from a JSON5 file and converts it to a DataFrame.
+    Loads data from a JSON file and converts it to a DataFrame.
+
+    Trailing commas, which are not valid JSON, are removed before parsing.
 
     Args:
-        filepath (str): The path to the JSON5 file.
+        filepath (str): The path to the JSON file.
 
     Returns:
-        pd.DataFrame: A DataFrame containing the data from the JSON file.
+        pd.DataFrame: A DataFrame containing the data from the JSON file, backed by Arrow dtypes.
     """
-    with open(filepath) as f:
-        data = json5.load(f)  # json5 handles trailing comma in json
-    return pd.DataFrame(data)
+    with open(filepath, "rb") as f:
+        raw = TRAILING_COMMA_PATTERN.sub(rb"\1", f.read())
+    data = orjson.loads(raw)
+    # Columns mixing types (e.g. int and str ids) are kept as objects.
+    return pd.DataFrame(data).convert_dtypes(dtype_backend="pyarrow")
 
 
 def concat_dataframes(dataframes, reset_index=True):
     """
     Concatenates a list of DataFrames into a single DataFrame.
 
+    Arrow-backed DataFrames are concatenated as Arrow tables when the index is reset.
+
     Args:
         dataframes (list of pd.DataFrame): The list of DataFrames to concatenate.
         reset_index (bool): If True, resets the index of the concatenated DataFrame. Default is True.
@@ -50,10 +86,32 @@ def concat_dataframes(dataframes, reset_index=True):
     if not dataframes:
         raise ValueError("The list of DataFrames is empty.")
 
+    if reset_index and all(is_arrow_backed(df) for df in dataframes):
+        # Arrow tables are concatenated without re-boxing values or rebuilding an index.
+        tables = [pa.Table.from_pandas(df, preserve_index=False) for df in dataframes]
+        try:
+            concatenated_table = pa.concat_tables(tables, promote_options="permissive")
+            return concatenated_table.to_pandas(types_mapper=pd.ArrowDtype)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass  # Incompatible column types (e.g. int and str ids) are left to pandas.
+
     concatenated_df = pd.concat(dataframes, ignore_index=reset_index)
     return concatenated_df
 
 
+def is_arrow_backed(df):
+    """
+    Checks whether all the columns of a DataFrame are backed by Arrow arrays.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to check.
+
+    Returns:
+        bool: True if every column has an Arrow-backed dtype.
+    """
+    return all(getattr(dtype, "storage", None) == "pyarrow" for dtype in df.dtypes)
+
+
 def delete_chars(df):
     """
     Cleans the DataFrame by removing specific unwanted characters and accents.
@@ -64,11 +122,24 @@ def delete_chars(df):
     Returns:
         pd.Dataframe: The cleaned DataFrame.
     """
-    df = df.map(lambda s: s.replace("\\xc3\\xb1", "") if isinstance(s, str) else s)
-    df = df.map(lambda s: s.replace("\\xc3\\x28", "") if isinstance(s, str) else s)
-    df = df.map(lambda s: s.replace("\u2122", "") if isinstance(s, str) else s)
-    df = df.map(lambda s: remove_accents(s) if isinstance(s, str) else s)
-    return df
+    return apply_to_str_columns(df, delete_chars_str)
+
+
+def delete_chars_str(series):
+    """
+    Removes specific unwanted characters and accents from a column of strings.
+
+    Args:
+        series (pd.Series): A column of strings to clean.
+
+    Returns:
+        pd.Series: The cleaned column.
+    """
+    return (
+        series.str.replace(UNWANTED_CHARS_PATTERN, "", regex=True)
+        .str.normalize("NFD")
+        .str.translate(COMBINING_MARKS)
+    )
 
 
 def remove_accents(text):
@@ -81,8 +152,47 @@ def remove_accents(text):
     Returns:
         str: The text without accents.
     """
-    text_nfd = unicodedata.normalize("NFD", text)
-    return "".join(c for c in text_nfd if unicodedata.category(c) != "Mn")
+    return unicodedata.normalize("NFD", text).translate(COMBINING_MARKS)
+
+
+def apply_to_str_columns(df, func):
+    """
+    Applies a vectorized string transformation to the text columns of a DataFrame.
+
+    Values that are not strings (numbers, missing values) are left untouched.
+
+    Args:
+        df (pd.DataFrame or pd.Series): A DataFrame (or a single column) to transform.
+        func (callable): A function taking and returning a pd.Series, built on the `.str` accessor.
+
+    Returns:
+        pd.DataFrame or pd.Series: The transformed DataFrame or Series.
+    """
+    if isinstance(df, pd.Series):
+        if not is_text_dtype(df.dtype):
+            return df
+        transformed = func(df)
+        return transformed.where(transformed.notna(), df)
+
+    df = df.copy()
+    for column in df.columns:
+        df[column] = apply_to_str_columns(df[column], func)
+    return df
+
+
+def is_text_dtype(dtype):
+    """
+    Checks whether a column dtype may hold strings.
+
+    Both Python object columns and Arrow-backed string columns are considered text.
+
+    Args:
+        dtype: The dtype of the column.
+
+    Returns:
+        bool: True if the column may hold strings.
+    """
+    return dtype == "object" or pd.api.types.is_string_dtype(dtype)
 
 
 def lower_strip_df(df):
@@ -95,13 +205,50 @@ def lower_strip_df(df):
     Returns:
         pd.Dataframe: The normalized DataFrame.
     """
-    return df.map(lambda s: s.lower().strip() if isinstance(s, str) else s)
+    return apply_to_str_columns(df, lower_strip_str)
+
+
+def lower_strip_str(series):
+    """
+    Converts a column of strings to lowercase and strips whitespace.
+
+    Args:
+        series (pd.Series): A column of strings to normalize.
+
+    Returns:
+        pd.Series: The normalized column.
+    """
+    return series.str.lower().str.strip()
+
+
+def normalize_column(series, is_date=False):
+    """
+    Normalizes a column with one call per column, instead of separate
+    whole-DataFrame passes for lowercasing, date formatting and cleaning.
+
+    Text columns are lowercased, stripped and cleaned from unwanted characters
+    and accents through a chain of `.str` operations. Date columns are lowercased,
+    stripped and formatted as YYYY-MM-DD.
+
+    Args:
+        series (pd.Series): The column to normalize.
+        is_date (bool): If True, the column is parsed as dates. Default is False.
+
+    Returns:
+        pd.Series: The normalized column.
+    """
+    if is_date:
+        return parse_dates(apply_to_str_columns(series, lower_strip_str))
+    return apply_to_str_columns(series, lambda s: delete_chars_str(lower_strip_str(s)))
 
 
 def format_date(df, column):
     """
     Converts a specified column in the DataFrame to datetime format.
 
+    The known formats are parsed first with their vectorized parser, the
+    remaining values fall back to the slower per-value "mixed" parsing.
+
     Args:
         df (pd.DataFrame): The DataFrame containing the date column.
         column (str): The name of the column to format as datetime.
@@ -109,50 +256,72 @@ def format_date(df, column):
     Returns:
         pd.DataFrame: The DataFrame with the formatted date column.
     """
-    df[column] = pd.to_datetime(df[column], format="mixed").astype(str)
+    df[column] = parse_dates(df[column])
     return df
 
 
+def parse_dates(dates):
+    """
+    Parses a column of dates and formats them as YYYY-MM-DD strings.
+
+    Args:
+        dates (pd.Series): The column of dates to parse.
+
+    Returns:
+        pd.Series: The formatted dates.
+    """
+    parsed = pd.Series(pd.NaT, index=dates.index, dtype="datetime64[ns]")
+    for date_format in DATE_FORMATS + ["mixed"]:
+        missing = parsed.isna() & dates.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(
+            dates[missing],
+            format=date_format,
+            errors="raise" if date_format == "mixed" else "coerce",
+        )
+    return parsed.astype(str)
+
+
 def consolidate_clinical_trials_df(df):
     """
     Merges rows in the DataFrame that have a common title.
 
+    Rows of a same (title, date, article type) are collapsed, each column taking
+    its first non-null value, and kept in file order.
+
     Args:
         df (pd.DataFrame): The DataFrame containing clinical trials data.
 
     Returns:
         pd.DataFrame: A consolidated DataFrame with merged rows.
     """
-    df_grouped = df.groupby(
-        ["title", "date_mention", "article_type"], as_index=False
-    ).agg(
-        {
-            "id": "first",
-            "journal": "first",
-        }
-    )
-    df_grouped.reset_index(drop=True, inplace=True)
-    return df_grouped
+    return df.groupby(
+        ["title", "date_mention", "article_type"], sort=False, as_index=False
+    ).first()
 
 
 def consolidate_pubmed_df(df):
     """
-    Cleans the PubMed DataFrame by removing rows with empty IDs.
+    Cleans the PubMed DataFrame by removing rows with empty, non-numeric or
+    fractional IDs.
 
     Args:
         df (pd.DataFrame): The DataFrame containing PubMed data.
 
     Returns:
-        pd.DataFrame: A cleaned DataFrame with valid IDs.
+        pd.DataFrame: A cleaned DataFrame with valid integer IDs.
     """
-    df_clean = df[df["id"].str.strip() != ""]
-    df_clean.loc[:, "id"] = df_clean["id"].astype("int")
-    return df_clean
+    # Going through the string dtype gives missing values (not NaN) for coerced ids,
+    # whether the column holds mixed objects or Arrow strings.
+    ids = pd.to_numeric(df["id"].astype("string[pyarrow]"), errors="coerce")
+    is_integer = (ids.notna() & (ids % 1 == 0)).fillna(False).astype(bool)
+    return df.assign(id=ids)[is_integer].astype({"id": "int64"})
 
 
 def write_dict_to_json(dict, filename):
     """
-    Writes a dictionary to a JSON file using a custom JSON encoder.
+    Writes a dictionary to a JSON file, dates being written as YYYY-MM-DD.
 
     Args:
         dict (dict): The dictionary to write to the JSON file.
@@ -161,11 +330,86 @@ def write_dict_to_json(dict, filename):
     Returns:
         None
     """
-    dict_json = json.dumps(dict, cls=TimestampEncoder)
-    with open(filename, "w") as f:
+    dict_json = orjson.dumps(
+        dict,
+        default=serialize_timestamp,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY,
+    )
+    with open(filename, "wb") as f:
         f.write(dict_json)
 
 
+def write_dfs_to_parquet(dataframes, filepaths):
+    """
+    Writes DataFrames to Parquet files, creating their folders if needed.
+
+    Args:
+        dataframes (list of pd.DataFrame): The DataFrames to write.
+        filepaths (list of str): The paths of the Parquet files, one per DataFrame.
+
+    Returns:
+        None
+    """
+    for df, filepath in zip(dataframes, filepaths):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        df.to_parquet(filepath, compression="zstd")
+
+
+def read_dfs_from_parquet(filepaths):
+    """
+    Reads DataFrames from Parquet files.
+
+    Args:
+        filepaths (list of str): The paths of the Parquet files.
+
+    Returns:
+        tuple: A tuple containing one Arrow-backed DataFrame per file.
+    """
+    return tuple(
+        pd.read_parquet(filepath, dtype_backend="pyarrow") for filepath in filepaths
+    )
+
+
+def is_cache_fresh(cache_paths, source_paths, version_path, version):
+    """
+    Checks whether cache files are up to date with their sources and the code that built them.
+
+    Args:
+        cache_paths (list of str): The paths of the cache files.
+        source_paths (list of str): The paths of the source files.
+        version_path (str): The path of the file holding the version of the cache.
+        version (str): The version expected for the cache (e.g. a hash of the code building it).
+
+    Returns:
+        bool: True if every cache file exists, is newer than every source file,
+            and the cache was written with the expected version.
+    """
+    if not all(os.path.exists(path) for path in cache_paths + [version_path]):
+        return False
+    with open(version_path) as f:
+        if f.read() != version:
+            return False
+    oldest_cache = min(os.path.getmtime(path) for path in cache_paths)
+    return all(os.path.getmtime(path) < oldest_cache for path in source_paths)
+
+
+def files_hash(filepaths):
+    """
+    Computes a hash of the content of files.
+
+    Args:
+        filepaths (list of str): The paths of the files to hash.
+
+    Returns:
+        str: The hexadecimal SHA-256 digest of the files content.
+    """
+    digest = hashlib.sha256()
+    for filepath in filepaths:
+        with open(filepath, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
 def find_mentions_in_publications(drugs_df, pub_df, pub_type):
     """
     Finds mentions of drugs in publication DataFrames.
@@ -178,57 +422,129 @@ def find_mentions_in_publications(drugs_df, pub_df, pub_type):
     Returns:
         dict: A dictionary containing drug mentions, with details from publications.
     """
-    result_dict = {}
-    for _, drug_row in drugs_df.iterrows():
-        pub_mention = []
-        journal_mention = []
-        for _, pub_row in pub_df.iterrows():
-            if drug_row["drug"] in pub_row["title"]:
-                pub_mention.append(
-                    {
-                        "publication_id": pub_row["id"],
-                        "title": pub_row["title"],
-                        "date_mention": pub_row["date_mention"],
-                        "journal": pub_row["journal"],
-                    }
-                )
-                journal_mention.append(
-                    {
-                        "date_mention": pub_row["date_mention"],
-                        "journal": pub_row["journal"],
-                    }
-                )
-        result_dict[drug_row["drug"]] = {
-            "code": drug_row["atccode"],
-            pub_type: pub_mention,
-            "journal": journal_mention,
+    return find_mentions_all(drugs_df, pub_df.assign(article_type=pub_type), [pub_type])
+
+
+def find_mentions_all(drugs_df, pub_df, article_types, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Finds mentions of drugs in publications of every type in a single scan.
+
+    All drug names are loaded into a single Aho-Corasick automaton which scans
+    every title in one pass, whatever the number of drugs. Each hit is then
+    appended to its drug, under the `article_type` of its publication. When there are more
+    than `chunk_size` publications, the chunks are scanned in parallel processes.
+
+    Args:
+        drugs_df (pd.DataFrame): DataFrame containing drug information.
+        pub_df (pd.DataFrame): DataFrame containing publication data with an `article_type` column.
+        article_types (list of str): The publication types listed for every drug, even without mentions.
+        chunk_size (int): The number of titles scanned by each process.
+
+    Returns:
+        dict: A dictionary containing drug mentions, with details from publications
+            and the distinct (date, journal) pairs quoting each drug.
+    """
+    result_dict = {
+        drug: {
+            "code": code,
+            **{article_type: [] for article_type in article_types},
+            "journal": [],
         }
+        for drug, code in zip(drugs_df["drug"], drugs_df["atccode"])
+    }
+    if not result_dict:
+        return result_dict
+
+    automaton = ahocorasick.Automaton()
+    for drug in result_dict:
+        automaton.add_word(drug, drug)
+    automaton.make_automaton()
+
+    titles = pub_df["title"].tolist()
+    starts = range(0, len(titles), chunk_size)
+    ends = range(chunk_size, len(titles) + chunk_size, chunk_size)
+    chunks = [titles[start:end] for start, end in zip(starts, ends)]
+    if len(chunks) > 1:
+        # The automaton is shipped once per worker process, not with every chunk.
+        with ProcessPoolExecutor(
+            initializer=init_scan_worker, initargs=(automaton,)
+        ) as executor:
+            chunk_hits = list(executor.map(scan_titles_in_worker, chunks, starts))
+    else:
+        chunk_hits = [scan_titles(automaton, chunk) for chunk in chunks]
+    hits = chain.from_iterable(chunk_hits)
+
+    ids = pub_df["id"].tolist()
+    dates = pub_df["date_mention"].tolist()
+    journals = pub_df["journal"].tolist()
+    pub_types = pub_df["article_type"].tolist()
+    seen_journals = {drug: set() for drug in result_dict}
+    for drug, row in hits:
+        result_dict[drug][pub_types[row]].append(
+            {
+                "publication_id": ids[row],
+                "title": titles[row],
+                "date_mention": dates[row],
+                "journal": journals[row],
+            }
+        )
+        journal_mention = (dates[row], journals[row])
+        if journal_mention not in seen_journals[drug]:
+            seen_journals[drug].add(journal_mention)
+            result_dict[drug]["journal"].append(
+                {"date_mention": dates[row], "journal": journals[row]}
+            )
     return result_dict
 
 
-def merge_dicts(dict1, dict2):
+def scan_titles(automaton, titles, first_row=0):
+    """
+    Finds the drugs quoted in a list of titles.
+
+    Titles are scanned as one contiguous buffer, then each match is mapped back
+    to its row through the title end offsets. The NUL separator cannot be part
+    of a drug name, so no match spans two titles.
+
+    Args:
+        automaton (ahocorasick.Automaton): Automaton built on the drug names.
+        titles (list of str): The titles to scan.
+        first_row (int): The row number of the first title.
+
+    Returns:
+        list of tuple: The (drug, row) hits, ordered by row.
+    """
+    title_ends = np.cumsum([len(title) + 1 for title in titles]) - 1
+    matches = list(automaton.iter("\0".join(titles)))
+    rows = np.searchsorted(title_ends, [end for end, _ in matches], side="right")
+    # A drug quoted several times in a title is only a single mention.
+    return list(
+        dict.fromkeys(zip([drug for _, drug in matches], (rows + first_row).tolist()))
+    )
+
+
+def init_scan_worker(automaton):
     """
-    Merges two dictionaries, combining their entries.
+    Stores the drug automaton in a scan worker process.
 
     Args:
-        dict1 (dict): The first dictionary to merge.
-        dict2 (dict): The second dictionary to merge.
+        automaton (ahocorasick.Automaton): Automaton built on the drug names.
 
     Returns:
-        dict: The merged dictionary with combined entries.
+        None
+    """
+    global worker_automaton
+    worker_automaton = automaton
+
+
+def scan_titles_in_worker(titles, first_row):
     """
-    merged_dict = dict1.copy()
+    Finds the drugs quoted in a list of titles with the automaton of the worker process.
 
-    for key, value in dict2.items():
-        if "clinical_trials" in value:
-            merged_dict[key]["clinical_trials"] = value["clinical_trials"]
-        combined_journal = merged_dict[key]["journal"] + value["journal"]
-        unique_journal = []
-        seen = set()
-        for entry in combined_journal:
-            identifier = (entry["date_mention"], entry["journal"])
-            if identifier not in seen:
-                unique_journal.append(entry)
-                seen.add(identifier)
-        merged_dict[key]["journal"] = unique_journal
-    return merged_dict
+    Args:
+        titles (list of str): The titles to scan.
+        first_row (int): The row number of the first title.
+
+    Returns:
+        list of tuple: The (drug, row) hits, ordered by row.
+    """
+    return scan_titles(worker_automaton, titles, first_row)
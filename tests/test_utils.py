@@ -1,17 +1,23 @@
 import unittest
 import json
+import os
+import tempfile
 import pandas as pd
 from datetime import datetime
 from src.utils.utils import (
+    json_to_df,
     concat_dataframes,
     delete_chars,
+    remove_accents,
     lower_strip_df,
+    normalize_column,
     format_date,
     consolidate_clinical_trials_df,
     consolidate_pubmed_df,
     write_dict_to_json,
+    is_cache_fresh,
     find_mentions_in_publications,
-    merge_dicts,
+    find_mentions_all,
 )
 
 
@@ -36,11 +42,22 @@ class TestPipelineUnitFunctions(unittest.TestCase):
             {"drug": ["drug A", "drug B"], "atccode": ["A01", "B02"]}
         )
 
+    def test_json_to_df_trailing_commas(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+            f.write('[{"id": 1, "title": "Study on drug A",},\n]')
+            f.flush()
+            df = json_to_df(f.name)
+        self.assertEqual(df.shape, (1, 2))
+        self.assertEqual(df["title"][0], "Study on drug A")
+
     def test_delete_chars(self):
         df = pd.Series(["\\xc3\\xb1drug™", "normal"])
         clean_df = delete_chars(df)
         self.assertEqual(clean_df[0], "drug")
 
+    def test_remove_accents(self):
+        self.assertEqual(remove_accents("Hôpitaux de Genève"), "Hopitaux de Geneve")
+
     def test_concat_multiple_dataframes(self):
         df1 = pd.DataFrame({"A": [1, 2], "B": [3, 4]})
         df2 = pd.DataFrame({"A": [5, 6], "B": [7, 8]})
@@ -50,12 +67,25 @@ class TestPipelineUnitFunctions(unittest.TestCase):
         result = concat_dataframes([df1, df2, df3])
         pd.testing.assert_frame_equal(result, expected)
 
+    def test_concat_arrow_dataframes(self):
+        df1 = pd.DataFrame({"id": ["1"], "title": ["A"]}, dtype="string[pyarrow]")
+        df2 = pd.DataFrame({"id": ["2"], "title": ["B"]}, dtype="string[pyarrow]")
+        result = concat_dataframes([df1, df2])
+        self.assertEqual(result["id"].tolist(), ["1", "2"])
+        self.assertIsInstance(result["title"].dtype, pd.ArrowDtype)
+
     def test_lower_strip_df(self):
         df = pd.Series(["  TEXT ", "MixedCase", ""])
         clean_df = lower_strip_df(df)
         self.assertEqual(clean_df[0], "text")
         self.assertEqual(clean_df[1], "mixedcase")
 
+    def test_lower_strip_df_keeps_non_string_values(self):
+        df = pd.DataFrame({"id": [1, "  AB "], "count": [3, 4]})
+        clean_df = lower_strip_df(df)
+        self.assertEqual(clean_df["id"].tolist(), [1, "ab"])
+        self.assertEqual(clean_df["count"].tolist(), [3, 4])
+
     def test_format_date(self):
         df = pd.DataFrame(
             {"mixed_dates": ["2022-01-01", "01/02/2022", "March 3, 2022", "2022.04.04"]}
@@ -66,6 +96,12 @@ class TestPipelineUnitFunctions(unittest.TestCase):
             formatted_date = pd.to_datetime(expected_dates[i]).strftime("%Y-%d-%m")
             self.assertEqual(formatted_df["mixed_dates"][i], formatted_date)
 
+    def test_normalize_column(self):
+        titles = normalize_column(pd.Series(["  Étude on DRUG A™ "]))
+        self.assertEqual(titles[0], "etude on drug a")
+        dates = normalize_column(pd.Series([" 1 January 2020 "]), is_date=True)
+        self.assertEqual(dates[0], "2020-01-01")
+
     def test_consolidate_clinical_trials_df(self):
         df = pd.DataFrame(
             {
@@ -79,6 +115,21 @@ class TestPipelineUnitFunctions(unittest.TestCase):
         consolidated_df = consolidate_clinical_trials_df(df)
         self.assertEqual(consolidated_df.shape[0], 1)
 
+    def test_consolidate_clinical_trials_df_split_rows(self):
+        df = pd.DataFrame(
+            {
+                "title": ["Study on drug A", "Study on drug A"],
+                "date_mention": ["2024-01-01", "2024-01-01"],
+                "article_type": ["clinical_trials", "clinical_trials"],
+                "id": ["NCT1", None],
+                "journal": [None, "Journal A"],
+            }
+        )
+        consolidated_df = consolidate_clinical_trials_df(df)
+        self.assertEqual(consolidated_df.shape[0], 1)
+        self.assertEqual(consolidated_df["id"][0], "NCT1")
+        self.assertEqual(consolidated_df["journal"][0], "Journal A")
+
     def test_consolidate_pubmed_df(self):
         df = pd.DataFrame(
             {
@@ -90,6 +141,21 @@ class TestPipelineUnitFunctions(unittest.TestCase):
         self.assertEqual(cleaned_df.shape[0], 2)
         self.assertEqual(cleaned_df["id"].convert_dtypes().dtype, "Int64")
 
+    def test_consolidate_pubmed_df_non_numeric_id(self):
+        df = pd.DataFrame({"id": [1, "2", "abc"], "title": ["A", "B", "C"]})
+        cleaned_df = consolidate_pubmed_df(df)
+        self.assertEqual(cleaned_df["id"].tolist(), [1, 2])
+
+    def test_consolidate_pubmed_df_fractional_id(self):
+        df = pd.DataFrame({"id": ["1", "2.5", "x"], "title": ["A", "B", "C"]})
+        cleaned_df = consolidate_pubmed_df(df)
+        self.assertEqual(cleaned_df["id"].tolist(), [1])
+
+    def test_consolidate_pubmed_df_arrow_ids(self):
+        df = pd.DataFrame({"id": ["1", "", "3"]}, dtype="string[pyarrow]")
+        arrow_df = concat_dataframes([df])
+        self.assertEqual(consolidate_pubmed_df(arrow_df)["id"].tolist(), [1, 3])
+
     def test_write_dict_to_json(self):
         data = {"key": datetime(2024, 1, 1)}
         write_dict_to_json(data, "tests/test_resources/test.json")
@@ -97,6 +163,24 @@ class TestPipelineUnitFunctions(unittest.TestCase):
             json_data = json.load(f)
         self.assertEqual(json_data["key"], "2024-01-01")
 
+    def test_is_cache_fresh(self):
+        with tempfile.TemporaryDirectory() as folder:
+            source = os.path.join(folder, "source.csv")
+            cache = os.path.join(folder, "cache.parquet")
+            version = os.path.join(folder, "version")
+            for path in [source, cache]:
+                open(path, "w").close()
+            with open(version, "w") as f:
+                f.write("v1")
+            self.assertFalse(
+                is_cache_fresh([cache + ".missing"], [source], version, "v1")
+            )
+            os.utime(source, (0, 0))
+            self.assertTrue(is_cache_fresh([cache], [source], version, "v1"))
+            self.assertFalse(is_cache_fresh([cache], [source], version, "v2"))
+            os.utime(cache, (0, 0))
+            self.assertFalse(is_cache_fresh([cache], [source], version, "v1"))
+
     def test_find_mentions_in_publications(self):
         pub_df = pd.DataFrame(
             {
@@ -110,19 +194,68 @@ class TestPipelineUnitFunctions(unittest.TestCase):
         self.assertIn("drug A", result)
         self.assertEqual(result["drug A"]["code"], "A01")
 
-    def test_merge_dicts(self):
-        dict1 = {
-            "drug A": {
-                "journal": [{"date_mention": "2024-01-01", "journal": "Journal A"}]
+    def test_find_mentions_in_publications_repeated_drug(self):
+        pub_df = pd.DataFrame(
+            {
+                "id": [1],
+                "title": ["drug A and drug A again, with drug B"],
+                "journal": ["Journal A"],
+                "date_mention": ["2024-01-01"],
+            }
+        )
+        result = find_mentions_in_publications(self.drugs_df, pub_df, "pubmed")
+        self.assertEqual(len(result["drug A"]["pubmed"]), 1)
+        self.assertEqual(len(result["drug B"]["pubmed"]), 1)
+
+    def test_find_mentions_in_publications_across_titles(self):
+        pub_df = pd.DataFrame(
+            {
+                "id": [1, 2],
+                "title": ["Study on drug", "A review"],
+                "journal": ["Journal A", "Journal B"],
+                "date_mention": ["2024-01-01", "2023-12-12"],
             }
-        }
-        dict2 = {
-            "drug A": {
-                "journal": [{"date_mention": "2023-12-12", "journal": "Journal B"}]
+        )
+        result = find_mentions_in_publications(self.drugs_df, pub_df, "pubmed")
+        self.assertEqual(result["drug A"]["pubmed"], [])
+
+    def test_find_mentions_in_publications_empty(self):
+        pub_df = pd.DataFrame(columns=["id", "title", "journal", "date_mention"])
+        result = find_mentions_in_publications(self.drugs_df, pub_df, "pubmed")
+        self.assertEqual(result["drug A"], {"code": "A01", "pubmed": [], "journal": []})
+
+    def test_find_mentions_all(self):
+        pub_df = pd.DataFrame(
+            {
+                "id": [1, "NCT1"],
+                "title": ["Study on drug A", "Trial of drug A"],
+                "journal": ["Journal A", "Journal A"],
+                "date_mention": ["2024-01-01", "2024-01-01"],
+                "article_type": ["pubmed", "clinical_trials"],
+            }
+        )
+        result = find_mentions_all(self.drugs_df, pub_df, ["pubmed", "clinical_trials"])
+        self.assertEqual(len(result["drug A"]["pubmed"]), 1)
+        self.assertEqual(
+            result["drug A"]["clinical_trials"][0]["publication_id"], "NCT1"
+        )
+        self.assertEqual(len(result["drug A"]["journal"]), 1)
+        self.assertEqual(result["drug B"]["clinical_trials"], [])
+
+    def test_find_mentions_all_in_chunks(self):
+        pub_df = pd.DataFrame(
+            {
+                "id": [1, 2, 3],
+                "title": ["Study on drug A", "Drug B", "drug A and drug B"],
+                "journal": ["Journal A", "Journal B", "Journal C"],
+                "date_mention": ["2024-01-01", "2023-12-12", "2023-01-01"],
+                "article_type": ["pubmed", "pubmed", "pubmed"],
             }
-        }
-        merged = merge_dicts(dict1, dict2)
-        self.assertEqual(len(merged["drug A"]["journal"]), 2)
+        )
+        self.assertEqual(
+            find_mentions_all(self.drugs_df, pub_df, ["pubmed"], chunk_size=1),
+            find_mentions_all(self.drugs_df, pub_df, ["pubmed"]),
+        )
 
 
 if __name__ == "__main__":